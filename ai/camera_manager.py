@@ -1,83 +1,231 @@
 import os
-import time
+import signal
+import atexit
 import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
 import numpy as np
 
 # Force OpenCV Log Level off before importing
 os.environ["OPENCV_LOG_LEVEL"] = "OFF"
 import cv2
-import tensorflow as tf
+
+def _inference_worker(model_path, num_threads, batch_size, conn, parent_conn):
+    """Child process: owns the TFLite interpreter so inference never holds the Flask GIL."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the parent
+    parent_conn.close()  # Inherited from fork; closing it lets recv() see EOF if the parent dies
+
+    try:
+        import tensorflow as tf
+        # Use all 4 Pi cores (XNNPACK is the default CPU delegate)
+        interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        input_details = interpreter.get_input_details()
+        input_index = input_details[0]['index']
+
+        # Get expected input shape (e.g., 224x224)
+        model_h, model_w = int(input_details[0]['shape'][1]), int(input_details[0]['shape'][2])
+
+        # Run the whole burst as one batch (per-op overhead is paid once).
+        # Fall back to one frame per invoke if the model has a fixed batch.
+        batch = batch_size
+        try:
+            interpreter.resize_tensor_input(input_index, [batch, model_h, model_w, 3])
+            interpreter.allocate_tensors()
+        except Exception:
+            batch = 1
+            interpreter.resize_tensor_input(input_index, [batch, model_h, model_w, 3])
+            interpreter.allocate_tensors()
+
+        # Live view of the input tensor
+        input_tensor = interpreter.tensor(input_index)
+        # INT8 models (see convert.py): input scale/zero point come from the calibration
+        # frames, so raw pixels can only be copied as-is when they are exactly (1.0, 0)
+        input_scale, input_zero_point = input_details[0]['quantization']
+        input_lut = None
+        if input_scale and (input_scale, input_zero_point) != (1.0, 0):
+            # Only 256 possible pixel values -> quantize once into a lookup table
+            input_dtype = input_details[0]['dtype']
+            input_range = np.iinfo(input_dtype)
+            input_lut = np.clip(np.round(np.arange(256) / input_scale + input_zero_point),
+                                input_range.min, input_range.max).astype(input_dtype)
+        output_details = interpreter.get_output_details()
+        output_index = output_details[0]['index']
+        output_scale, output_zero_point = output_details[0]['quantization']
+    except Exception as e:
+        conn.send(("error", str(e)))
+        return
+
+    # Handshake: tell the parent the input size, get back the shared frame buffer
+    conn.send(("ready", model_h, model_w, batch))
+    shm = shared_memory.SharedMemory(name=conn.recv())
+    # The parent owns (and unlinks) the segment. Without this, the child's own
+    # resource tracker unlinks it when the worker is killed and warns about a leak.
+    resource_tracker.unregister(shm._name, "shared_memory")
+    imgs = np.ndarray((batch_size, model_h, model_w, 3), np.uint8, buffer=shm.buf)
+
+    while True:
+        try: n = conn.recv()
+        except EOFError: break  # Parent is gone
+
+        try:
+            probs = []
+            for i in range(0, n, batch):
+                chunk = imgs[i:min(i + batch, n)]
+                # Copy (+ cast for float models / quantize via the LUT) into the input
+                # tensor. Don't keep the view around: invoke() refuses to run while it's referenced.
+                if input_lut is not None:
+                    np.take(input_lut, chunk, out=input_tensor()[:len(chunk)], mode='clip')
+                else:
+                    np.copyto(input_tensor()[:len(chunk)], chunk, casting='unsafe')
+                interpreter.invoke()
+                probs.append(interpreter.get_tensor(output_index)[:len(chunk)])
+            probs = np.concatenate(probs)
+
+            # Dequantize INT8 output (scale is 0 for float models)
+            if output_scale:
+                probs = (probs.astype("float32") - output_zero_point) * output_scale
+            conn.send(("ok", probs))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+    del imgs
+    shm.close()
+
+def open_camera():
+    """Opens the first working camera with the kiosk's capture settings (also used by convert.py)."""
+    # Try indices 0, 1, -1 to find a camera
+    for idx in [0, 1, -1]:
+        try:
+            cap = cv2.VideoCapture(idx, cv2.CAP_V4L2)
+            if cap.isOpened():
+                # Frames are read on demand: keep only 1 frame in the driver,
+                # use MJPG (less USB bandwidth) at a small resolution
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+                cap.set(cv2.CAP_PROP_FPS, 15)
+
+                # Some cameras silently ignore MJPG and stay on YUYV
+                try:
+                    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, "little").decode(errors="replace")
+                except (OverflowError, ValueError):
+                    fourcc = "????"
+                w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                if fourcc != "MJPG":
+                    print(f"⚠️ Camera rejected MJPG (using {fourcc})")
+
+                print(f"📷 Camera started on index {idx} ({fourcc} {w}x{h})")
+                return cap
+            cap.release()
+        except: continue
+    return None
+
+def preprocess_frame(frame, model_w, model_h, dst=None, small=None):
+    """Resize first (smaller buffer), then BGR->RGB. Same steps for the kiosk and convert.py."""
+    small = cv2.resize(frame, (model_w, model_h), dst=small, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=dst)
 
 class CameraManager:
-    def __init__(self, model_path):
+    def __init__(self, model_path, num_threads=4, batch_size=3):
         self.model_path = model_path
+        self.batch_size = batch_size  # Frames per scan (see capture_burst)
         self.lock = threading.Lock()
         self.cap = None
-        self.latest_frame = None
         self.running = False
 
-        # Load AI Model
+        # Load AI Model (in a child process, see _inference_worker)
+        self.worker = None
+        self._shm = None
+        self._infer_lock = threading.Lock()
         try:
-            self.interpreter = tf.lite.Interpreter(model_path=model_path)
-            self.interpreter.allocate_tensors()
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
-            
-            # Get expected input shape (e.g., 224x224)
-            self.model_h = self.input_details[0]['shape'][1]
-            self.model_w = self.input_details[0]['shape'][2]
-            self.input_index = self.input_details[0]['index']
-            self.output_index = self.output_details[0]['index']
-            print(f"✅ AI Model Loaded")
+            # fork: spawn would re-import app.py in the child
+            ctx = mp.get_context("fork")
+            self._conn, child_conn = ctx.Pipe()
+            self.worker = ctx.Process(target=_inference_worker, args=(model_path, num_threads, batch_size, child_conn, self._conn), daemon=True)
+            self.worker.start()
+            child_conn.close()  # So recv() raises EOFError if the worker dies
+
+            msg = self._conn.recv()
+            if msg[0] != "ready": raise RuntimeError(msg[1])
+            _, self.model_h, self.model_w, model_batch = msg
+
+            # Shared frame buffer: we preprocess into it, the worker reads it (no pickling)
+            self._shm = shared_memory.SharedMemory(create=True, size=batch_size * self.model_h * self.model_w * 3)
+            self._imgs = np.ndarray((batch_size, self.model_h, self.model_w, 3), np.uint8, buffer=self._shm.buf)
+            self._conn.send(self._shm.name)
+            atexit.register(self.close)
+
+            # Resize target (reused every scan)
+            self._small = np.empty((self.model_h, self.model_w, 3), np.uint8)
+            print(f"✅ AI Model Loaded ({num_threads} threads, batch {model_batch}, worker pid {self.worker.pid})")
         except Exception as e:
             print(f"❌ AI Init Error: {e}")
-            self.interpreter = None
+            if self.worker: self.worker.kill()
+            self.worker = None
+
+    def close(self):
+        if self.worker:
+            self.worker.kill()
+            self.worker.join(timeout=1)
+            self.worker = None
+        if self._shm:
+            del self._imgs
+            self._shm.close()
+            try: self._shm.unlink()
+            except FileNotFoundError: pass
+            self._shm = None
 
     def start_camera(self):
         if self.running and self.cap: return True
-        
-        # Try indices 0, 1, -1 to find a camera
-        for idx in [0, 1, -1]:
-            try:
-                cap = cv2.VideoCapture(idx, cv2.CAP_V4L2)
-                if cap.isOpened():
-                    self.cap = cap
-                    self.running = True
-                    threading.Thread(target=self._camera_loop, daemon=True).start()
-                    print(f"📷 Camera started on index {idx}")
-                    return True
-            except: continue
-        return False
-
-    def _camera_loop(self):
-        while self.running and self.cap:
-            ret, frame = self.cap.read()
-            if ret:
-                with self.lock: 
-                    self.latest_frame = frame
-            else: 
-                time.sleep(0.1)
+        cap = open_camera()
+        if cap is None: return False
+        self.cap = cap
+        self.running = True
+        return True
 
     def capture_frame(self):
-        with self.lock: 
-            return self.latest_frame.copy() if self.latest_frame is not None else None
+        if not self.cap: return None
+        with self.lock:
+            # Drain stale frames so we get what the camera sees *now*
+            for _ in range(3):
+                self.cap.grab()
+            ret, frame = self.cap.retrieve()
+            return frame if ret else None
 
-    def predict(self, frame):
-        if not self.interpreter or frame is None:
+    def capture_burst(self, count=None):
+        """Captures `count` consecutive frames (default batch_size), ~1 frame interval apart."""
+        if not self.cap: return []
+        count = count or self.batch_size
+        frames = []
+        first = self.capture_frame()
+        if first is not None: frames.append(first)
+        with self.lock:
+            # Driver buffer is 1 deep: each grab() waits for the next new frame
+            for _ in range(count - 1):
+                if not self.cap.grab(): continue
+                ret, frame = self.cap.retrieve()
+                if ret: frames.append(frame)
+        return frames
+
+    def predict_burst(self, frames):
+        frames = [f for f in frames if f is not None][:self.batch_size]
+        if not self.worker or not frames:
             return "Error"
 
         try:
-            # Preprocess: Resize & Convert to float32
-            img = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), (self.model_w, self.model_h))
-            img_array = np.expand_dims(img.astype("float32"), axis=0)
-
-            # Inference
-            self.interpreter.set_tensor(self.input_index, img_array)
-            self.interpreter.invoke()
-            probs = self.interpreter.get_tensor(self.output_index)[0]
+            with self._infer_lock:
+                # Preprocess straight into each frame's shared buffer slot
+                for i, frame in enumerate(frames):
+                    preprocess_frame(frame, self.model_w, self.model_h, dst=self._imgs[i], small=self._small)
+
+                # Inference (in the worker process, one batch)
+                self._conn.send(len(frames))
+                status, probs = self._conn.recv()
+            if status != "ok": raise RuntimeError(probs)
             
-            # Map index to label
-            pred_idx = np.argmax(probs)
+            # Temporal voting: average the class probabilities over the burst
+            pred_idx = np.argmax(np.mean(probs, axis=0))
             # 0=Can, 1=Other, 2=Plastic (Based on your previous code logic)
             if pred_idx == 0: return "Can"
             if pred_idx == 2: return "Plastic"
@@ -85,4 +233,7 @@ class CameraManager:
 
         except Exception as e:
             print(f"AI Prediction Error: {e}")
-            return "Other"
\ No newline at end of file
+            return "Other"
+
+    def predict(self, frame):
+        return self.predict_burst([frame])
@@ -1,8 +1,12 @@
 import os
 import time
 import io
+import queue
+import threading
 import requests
-import qrcode
+from requests.adapters import HTTPAdapter
+import segno
+import functools
 from datetime import datetime, timezone
 from flask import Flask, render_template, jsonify, send_file
 from dotenv import load_dotenv
@@ -22,33 +26,80 @@ BASE_URL = os.getenv("BASE_URL", "http://localhost:3000")
 API_URL = f"{BASE_URL}/api/machine/kiosk"
 PI_SECRET = os.getenv("PI_SECRET", "default")
 BIN_ID = os.getenv("BIN_ID", "BIN_01")
-MODEL_PATH = "model/ai-model-fp32-v2.tflite"
+MODEL_PATH = os.getenv("MODEL_PATH", "model/ai-model-fp32-v2.tflite")
 
 if not url or not key:
     raise ValueError("❌ Error: Missing Supabase credentials in .env file")
 
+# One pooled keep-alive session for kiosk API calls (skips TCP/TLS handshake each time)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 supabase: Client = create_client(url, key)
 print(f"✅ Connected to Supabase for {BIN_ID}")
 
+# Supabase writes happen on a background thread so routes never wait on HTTPS
+SYNC_Q = queue.Queue(maxsize=8)
+
 def sync_status(state, fill_level):
-    try:
-        data = {
-            "status": state,
-            "fillLevel": fill_level,
-            "lastActive": datetime.now(timezone.utc).isoformat(),
-            "isOnline": True
-        }
-        
-        # Use the bin_id loaded from .env (matches Prisma 'id' field)
-        supabase.table("Bin").update(data).eq("id", BIN_ID).execute()
-        
-    except Exception as e:
-        print(f"⚠️ Cloud Sync Failed: {e}")
+    data = {
+        "status": state,
+        "fillLevel": fill_level,
+        "lastActive": datetime.now(timezone.utc).isoformat(),
+        "isOnline": True
+    }
+    # Never block: if the worker is behind, drop the oldest update instead
+    while True:
+        try:
+            SYNC_Q.put_nowait(data)
+            return
+        except queue.Full:
+            try: SYNC_Q.get_nowait()
+            except queue.Empty: pass
+
+def _sync_worker():
+    while True:
+        data = SYNC_Q.get()
+        # Coalesce: only the newest status matters
+        while True:
+            try: data = SYNC_Q.get_nowait()
+            except queue.Empty: break
+        try:
+            # Use the bin_id loaded from .env (matches Prisma 'id' field)
+            supabase.table("Bin").update(data).eq("id", BIN_ID).execute()
+        except Exception as e:
+            print(f"⚠️ Cloud Sync Failed: {e}")
+
         
         
 # --- INITIALIZE SYSTEMS ---
-hw = HardwareManager()
+# Camera first: it forks the AI worker process, which must happen before any threads start
 cam = CameraManager(MODEL_PATH)
+hw = HardwareManager()
+
+threading.Thread(target=_sync_worker, daemon=True).start()
+
+# --- BIN LEVEL CACHE ---
+# An ultrasonic ping blocks for 50-150 ms, so only the background thread pings
+# (every 0.5s); routes just read the last value.
+_bin_cache = {"val": {"percent": 0, "is_full": False}}
+
+def cached_bin_level():
+    return _bin_cache["val"]
+
+def _bin_refresh_loop():
+    while True:
+        try:
+            reading = hw.get_bin_level()
+            if reading is not None:
+                # Single assignment: readers see either the old or the new dict
+                _bin_cache["val"] = reading
+        except Exception as e:
+            print(f"⚠️ Bin Sensor Error: {e}")
+        time.sleep(0.5)
+
+threading.Thread(target=_bin_refresh_loop, daemon=True).start()
 
 # --- GLOBAL STATE ---
 state = { 
@@ -57,39 +108,49 @@ state = {
     "total_weight": 0, "last_item": "Ready", "last_weight": 0, 
     "transaction_id": None, "claim_secret": None 
 }
-qr_img_buffer = None
+qr_img_bytes = None   # PNG bytes of the current claim QR
+qr_img_etag = None    # Transaction the QR belongs to
 
 # ==========================================
 # 🧠 THE BRAIN (Logic)
 # ==========================================
+def flash_capture():
+    hw.set_lights(hw.COLOR_FLASH)
+    time.sleep(0.3)             
+    frames = cam.capture_burst()  # A few frames, so one blurry frame can't decide alone
+    hw.set_lights(hw.COLOR_OFF)      
+    return frames
+
 def process_scan_request():
     try:
-        # 1. PHYSICAL SENSING
-        w_before = hw.get_weight()
+        # 1. PHYSICAL SENSING (settled: an item dropped just before the press
+        #    must not be mistaken for an empty scale by the lagging average)
+        w_before = hw.get_settled_weight()
         metal_found = hw.is_metal_detected()
         print(f"\n⚖️  Scale: {w_before:.2f}g | Metal: {metal_found}")
 
-        # 2. CAPTURE
-        hw.set_lights(hw.COLOR_FLASH)
-        time.sleep(0.3)             
-        frame = cam.capture_frame()
-        hw.set_lights(hw.COLOR_OFF)      
-
-        if frame is None: return None, 0
+        # --- WEIGHT GATES (skip camera + AI when the answer is already known) ---
 
-        # 3. AI PREDICTION
-        label = cam.predict(frame)
-        print(f"   [AI] Result: {label}")
+        # 🫙 NOTHING DEPOSITED
+        if w_before < 2.0:
+            print("   ⚠️ SKIPPED: Nothing on the scale")
+            return "Other", 0
 
-        # --- HYBRID LOGIC & CONSTRAINTS ---
-        
         # 🚫 50g WEIGHT LIMIT
         if w_before > 50.0:
             print(f"   ⚠️ REJECTED: Too heavy ({w_before:.1f}g)")
-            label = "Other"
+            return "Other", 0
+
+        # 2. CAPTURE
+        frames = flash_capture()
+        if not frames: return None, 0
+
+        # 3. AI PREDICTION (batched, averaged over the burst)
+        label = cam.predict_burst(frames)
+        print(f"   [AI] Result: {label}")
 
-        # ❌ SENSOR CONFLICTS
-        elif label == "Can" and not metal_found:
+        # --- HYBRID LOGIC (SENSOR CONFLICTS) ---
+        if label == "Can" and not metal_found:
             print("   Correction: AI said Can, but No Metal -> Changing to Other")
             label = "Other"
         
@@ -106,9 +167,9 @@ def process_scan_request():
         # 4. DISPENSE
         hw.run_motor_sequence(label)
         
-        # 5. CALC WEIGHT
-        time.sleep(0.5)
-        w_after = hw.get_weight()
+        # 5. CALC WEIGHT (let the scale settle only if something moved)
+        if label != "Other": time.sleep(0.5)
+        w_after = hw.get_settled_weight()
         item_weight = abs(w_before - w_after)
         
         return label, item_weight
@@ -117,6 +178,13 @@ def process_scan_request():
         print(f"❌ Scan Error: {e}")
         return None, 0
 
+@functools.lru_cache(maxsize=32)
+def _qr_png(url):
+    # Same transaction -> same URL -> reuse the PNG (e.g. stop pressed twice)
+    buf = io.BytesIO()
+    segno.make_qr(url, error='M').save(buf, kind="png", scale=6, border=2)
+    return buf.getvalue()
+
 # ==========================================
 # 🌐 FLASK ROUTES
 # ==========================================
@@ -125,36 +193,31 @@ def index(): return render_template('kiosk.html')
 
 @app.route('/state')
 def get_state():
-    # 1. Initialize with default values (Safety First)
-    bin_data = {"percent": 0, "is_full": False} 
-
-    # 2. Try to get real data
-    try:
-        reading = hw.get_bin_level()
-        if reading is not None:
-            bin_data = reading
-    except Exception as e:
-        print(f"⚠️ Bin Sensor Error in route: {e}")
-        # We keep the default 'bin_data' so the app doesn't crash
+    # 1. Cached reading (defaults to empty if the sensor fails)
+    bin_data = cached_bin_level()
 
-    # 3. Update global state response
+    # 2. Update global state response
     response = state.copy()
     response["bin_level"] = bin_data["percent"]
     response["bin_full"] = bin_data["is_full"]
     
-    # 4. Sync to Supabase
+    # 3. Sync to Supabase
     sync_status(state["status"], bin_data["percent"])
     
     return jsonify(response)
 
 @app.route('/qr_image')
 def get_qr_image(): 
-    return send_file(qr_img_buffer, mimetype='image/png') if qr_img_buffer else ("", 404)
+    if not qr_img_bytes: return ("", 404)
+    # The QR never changes within a transaction -> let the browser cache it
+    res = send_file(io.BytesIO(qr_img_bytes), mimetype='image/png', max_age=3600, etag=qr_img_etag)
+    res.cache_control.immutable = True
+    return res
 
 @app.route('/action/start', methods=['POST'])
 def start():
     # 🛑 [NEW] CRITICAL BLOCKER: Check Bin First
-    bin_status = hw.get_bin_level()
+    bin_status = cached_bin_level()
     if bin_status["is_full"]:
         print("🚫 Start Denied: Bin is Full")
         return jsonify({"error": "BIN_FULL"}), 400
@@ -165,7 +228,7 @@ def start():
     hw.tare_scale()
     
     try:
-        res = requests.post(API_URL, json={"action": "START", "binId": BIN_ID, "secret": PI_SECRET}, timeout=5)
+        res = SESSION.post(API_URL, json={"action": "START", "binId": BIN_ID, "secret": PI_SECRET}, timeout=5)
         data = res.json()
         state["transaction_id"] = data.get("transactionId", f"OFF-{int(time.time())}")
         state["claim_secret"] = data.get("claimSecret", "offline")
@@ -175,7 +238,7 @@ def start():
     state.update({"status": "RUNNING", "plastic": 0, "cans": 0, "other": 0, "total_weight": 0})
     
     # Sync bin status to Supabase
-    bin_status = hw.get_bin_level()
+    bin_status = cached_bin_level()
     sync_status("RUNNING", bin_status["percent"])
     
     return jsonify({"success": True})
@@ -191,7 +254,7 @@ def scan():
         else: state["other"] += 1
         
         # Sync bin status to Supabase after each item
-        bin_status = hw.get_bin_level()
+        bin_status = cached_bin_level()
         sync_status("RUNNING", bin_status["percent"])
         
         return jsonify({"success": True, "label": label, "weight": round(weight, 1)})
@@ -201,7 +264,7 @@ def scan():
 def stop():
     state["status"] = "SHOW_RESULT"
     try:
-        requests.post(API_URL, json={
+        SESSION.post(API_URL, json={
             "action": "STOP", 
             "transactionId": state["transaction_id"], 
             "plastic": state["plastic"], 
@@ -212,25 +275,22 @@ def stop():
     
     # Generate QR
     url = f"{BASE_URL}/claim/{state['transaction_id']}?secret={state['claim_secret']}"
-    qr = qrcode.make(url)
-    buf = io.BytesIO()
-    qr.save(buf, format="PNG")
-    buf.seek(0)
-    global qr_img_buffer
-    qr_img_buffer = buf
+    global qr_img_bytes, qr_img_etag
+    qr_img_bytes = _qr_png(url)
+    qr_img_etag = str(state["transaction_id"])
     
     # Sync bin status to Supabase
-    bin_status = hw.get_bin_level()
+    bin_status = cached_bin_level()
     sync_status("SHOW_RESULT", bin_status["percent"])
     
-    return jsonify({"success": True})
+    return jsonify({"success": True, "transaction_id": qr_img_etag})
 
 @app.route('/action/reset', methods=['POST'])
 def reset():
     state["status"] = "IDLE"
     
     # Sync bin status to Supabase
-    bin_status = hw.get_bin_level()
+    bin_status = cached_bin_level()
     sync_status("IDLE", bin_status["percent"])
     
     return jsonify({"success": True})
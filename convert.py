@@ -0,0 +1,54 @@
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+
+# Same camera settings + preprocessing as the kiosk, so activation ranges match
+from ai.camera_manager import open_camera, preprocess_frame
+
+# --- CONFIGURATION ---
+KERAS_MODEL_PATH = "model/ai-model.keras"
+OUTPUT_PATH = "model/ai-model-int8.tflite"
+NUM_SAMPLES = 200       # Calibration frames (100-500 is plenty)
+SAMPLE_DELAY = 0.05     # Seconds between frames -> move items around while it records!
+
+print(f"🧠 Loading Keras model: {KERAS_MODEL_PATH}")
+model = tf.keras.models.load_model(KERAS_MODEL_PATH)
+_, model_h, model_w, _ = model.input_shape
+
+# 1. CAPTURE CALIBRATION FRAMES (from the real kiosk camera)
+cap = open_camera()
+if cap is None:
+    print("🛑 FATAL: No working camera found.")
+    sys.exit(1)
+
+frames = []
+print(f"🎞️  Capturing {NUM_SAMPLES} frames...")
+while len(frames) < NUM_SAMPLES:
+    ret, frame = cap.read()
+    if not ret:
+        time.sleep(0.1)
+        continue
+    img = preprocess_frame(frame, model_w, model_h)
+    frames.append(img.astype("float32"))
+    time.sleep(SAMPLE_DELAY)
+cap.release()
+
+def representative_dataset():
+    for img in frames:
+        yield [np.expand_dims(img, axis=0)]
+
+# 2. CONVERT (Full INT8, uint8 in/out)
+converter = tf.lite.TFLiteConverter.from_keras_model(model)
+converter.optimizations = [tf.lite.Optimize.DEFAULT]
+converter.representative_dataset = representative_dataset
+converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+converter.inference_input_type = tf.uint8
+converter.inference_output_type = tf.uint8
+tflite_model = converter.convert()
+
+with open(OUTPUT_PATH, "wb") as f:
+    f.write(tflite_model)
+
+print(f"✅ Saved {OUTPUT_PATH} ({len(tflite_model) / 1024:.0f} KB)")
+print(f"   Run the kiosk with: MODEL_PATH={OUTPUT_PATH} python app.py")
@@ -1,6 +1,7 @@
 import sys
 import importlib
 import time
+import threading
 import board
 import neopixel
 import RPi.GPIO as GPIO
@@ -51,6 +52,16 @@ class HardwareManager:
         self.COLOR_GREEN = (0, 255, 0)
         self.COLOR_RED = (255, 0, 0)
 
+        # Echo edges are timestamped by an interrupt callback (see _on_echo_edge)
+        self._echo_start = None
+        self._echo_end = None
+        self._echo_done = threading.Event()
+
+        # Weight is sampled in the background (see _weight_loop)
+        self._ema = 0.0
+        self._last_sample = 0.0
+        self._hx_lock = threading.Lock()
+
         # Initialize
         self.setup_drivers()
 
@@ -76,12 +87,16 @@ class HardwareManager:
             print(f"⚠️ Motor Driver Error: {e}")
             self.kit = None
 
-        # 3. Metal Sensor
+        # 3. Metal Sensor (state kept up to date by an edge interrupt)
         GPIO.setup(self.METAL_SENSOR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        # Register first, then seed: an edge between the two can't be lost
+        GPIO.add_event_detect(self.METAL_SENSOR_PIN, GPIO.BOTH, callback=self._on_metal_edge)
+        self._on_metal_edge(self.METAL_SENSOR_PIN)
 
         # 4. Bin Sensor (Ultrasonic)
         GPIO.setup(self.BIN_TRIG_PIN, GPIO.OUT)
         GPIO.setup(self.BIN_ECHO_PIN, GPIO.IN)
+        GPIO.add_event_detect(self.BIN_ECHO_PIN, GPIO.BOTH, callback=self._on_echo_edge)
 
         # 5. Weight Sensor
         try:
@@ -90,6 +105,7 @@ class HardwareManager:
             self.hx.set_reference_unit(self.CALIBRATION_FACTOR)
             self.hx.reset()
             self.hx.tare()
+            threading.Thread(target=self._weight_loop, daemon=True).start()
             print("✅ Weight Sensor Ready")
         except Exception as e: 
             print(f"⚠️ Weight Sensor Error: {e}")
@@ -103,22 +119,56 @@ class HardwareManager:
             self.pixels.fill(color)
             self.pixels.show()
 
-    def is_metal_detected(self):
+    def _on_metal_edge(self, channel):
         # Usually LOW means metal detected
-        return GPIO.input(self.METAL_SENSOR_PIN) == 0
+        self._metal_state = GPIO.input(channel) == 0
+
+    def is_metal_detected(self):
+        return self._metal_state
+
+    def _weight_loop(self):
+        # Read single samples forever and smooth them (EMA), so get_weight never blocks
+        while self.hx:
+            try:
+                with self._hx_lock:
+                    val = self.hx.get_weight(1)
+                self._last_sample = val
+                self._ema = 0.6 * self._ema + 0.4 * val
+            except: pass
+            time.sleep(0.05)
 
     def get_weight(self):
         if self.hx:
-            try:
-                val = self.hx.get_weight(5)
-                return val if val > 0.5 else 0.0 
-            except: return 0.0
+            return self._ema if self._ema > 0.5 else 0.0
         return 0.0
 
+    def get_settled_weight(self, tolerance=1.0, timeout=1.5):
+        # The EMA lags a step change (item dropped / removed) by ~0.5s. Wait until
+        # the newest sample agrees with it, i.e. the load stopped changing.
+        # Returns immediately when the scale is already steady.
+        deadline = time.monotonic() + timeout
+        while self.hx and time.monotonic() < deadline:
+            if abs(self._last_sample - self._ema) <= tolerance: break
+            time.sleep(0.05)
+        return self.get_weight()
+
     def tare_scale(self):
         if self.hx:
-            self.hx.reset()
-            self.hx.tare()
+            with self._hx_lock:
+                self.hx.reset()
+                self.hx.tare()
+                self._ema = 0.0
+                self._last_sample = 0.0
+
+    def _on_echo_edge(self, channel):
+        # 1st edge after a trigger = rising, 2nd = falling. Don't read the pin
+        # level here: a short echo may already be over when the callback runs.
+        now = time.perf_counter()
+        if self._echo_start is None:
+            self._echo_start = now
+        elif not self._echo_done.is_set():
+            self._echo_end = now
+            self._echo_done.set()
 
     def get_bin_level(self):
         """Returns dict: {'percent': int, 'is_full': bool}"""
@@ -126,29 +176,18 @@ class HardwareManager:
             # Trigger Pulse
             GPIO.output(self.BIN_TRIG_PIN, False)
             time.sleep(0.05)
+            self._echo_start = None
+            self._echo_done.clear()
             GPIO.output(self.BIN_TRIG_PIN, True)
             time.sleep(0.00001)
             GPIO.output(self.BIN_TRIG_PIN, False)
 
-            # Listen for Echo
-            pulse_start = time.time()
-            pulse_end = time.time()
-            timeout = time.time() + 0.1
-
-            while GPIO.input(self.BIN_ECHO_PIN) == 0:
-                pulse_start = time.time()
-                # FIX: Return default dict instead of None
-                if pulse_start > timeout: 
-                    return {"percent": 0, "is_full": False, "error": True}
-
-            while GPIO.input(self.BIN_ECHO_PIN) == 1:
-                pulse_end = time.time()
-                # FIX: Return default dict instead of None
-                if pulse_end > timeout: 
-                    return {"percent": 0, "is_full": False, "error": True}
+            # Listen for Echo (both edges are timestamped by the interrupt callback)
+            if not self._echo_done.wait(timeout=0.1):
+                return {"percent": 0, "is_full": False, "error": True}
 
             # Calculate Distance
-            duration = pulse_end - pulse_start
+            duration = self._echo_end - self._echo_start
             distance = duration * 17150
             
             # Calculate Percentage